@@ -5,13 +5,17 @@ Serves the HTML file and handles CORS for Ollama API calls
 """
 
 import http.server
-import socketserver
 import webbrowser
 import os
 import sys
 from urllib.parse import urlparse, parse_qs
 import json
 import requests
+from requests.adapters import HTTPAdapter
+
+# Shared keep-alive pool so proxied calls reuse the TCP connection to Ollama
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0))
 
 class CORSHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     def end_headers(self):
@@ -40,22 +44,37 @@ class CORSHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         try:
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
-            
-            # Forward request to Ollama
-            response = requests.post(
+
+            # Forward request to Ollama over the pooled session
+            response = SESSION.post(
                 'http://localhost:11434/api/generate',
                 data=post_data,
                 headers={'Content-Type': 'application/json'},
-                timeout=60
+                timeout=60,
+                stream=True
             )
-            
-            self.send_response(response.status_code)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(response.content)
-            
         except Exception as e:
             self.send_error(500, f"Ollama proxy error: {str(e)}")
+            return
+
+        self.send_response(response.status_code)
+        self.send_header('Content-Type', response.headers.get('Content-Type', 'application/json'))
+        self.end_headers()
+
+        # Relay chunks as they arrive instead of buffering the full response,
+        # so token generation overlaps with the send to the browser. Headers
+        # are already out at this point, so on a relay error (aborted fetch,
+        # upstream drop) just close the connection — send_error would write a
+        # second status line into a half-sent body.
+        try:
+            for chunk in response.iter_content(chunk_size=None):
+                if chunk:
+                    self.wfile.write(chunk)
+                    self.wfile.flush()
+        except Exception:
+            self.close_connection = True
+        finally:
+            response.close()
 
 def check_ollama():
     """Check if Ollama is running"""
@@ -87,7 +106,8 @@ def main():
     # Change to the directory containing the HTML file
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
     
-    with socketserver.TCPServer(("", PORT), CORSHTTPRequestHandler) as httpd:
+    # Threading server so static files aren't blocked behind long Ollama generations
+    with http.server.ThreadingHTTPServer(("", PORT), CORSHTTPRequestHandler) as httpd:
         print(f"🌐 Server running at http://localhost:{PORT}")
         print("📱 Open your browser and navigate to the URL above")
         print("🎤 Click the microphone button to start recording")
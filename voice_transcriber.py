@@ -7,35 +7,80 @@ from conversations using local Llama 3.2 model via Ollama.
 
 import speech_recognition as sr
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import orjson
+import os
 import time
 import threading
+import queue
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.cluster import KMeans
-from sklearn.metrics.pairwise import cosine_similarity
-import networkx as nx
-import matplotlib.pyplot as plt
-from collections import defaultdict, deque
+from collections import defaultdict, deque, OrderedDict
+
+# torch, sentence_transformers, networkx and matplotlib are imported lazily
+# inside the code that needs them — together they add seconds and tens of MB
+# to module import
 
 
 class VoiceTranscriber:
     """Real-time voice transcription system."""
     
     def __init__(self, ollama_url: str = "http://localhost:11434"):
+        # Deferred heavyweight imports keep `import voice_transcriber` fast
+        import torch
+        import networkx as nx
+        from sentence_transformers import SentenceTransformer
+        from faster_whisper import WhisperModel
+
+        # Inference only: use all cores and skip autograd bookkeeping
+        torch.set_num_threads(os.cpu_count())
+        torch.set_grad_enabled(False)
+
         self.recognizer = sr.Recognizer()
         self.microphone = sr.Microphone()
         self.ollama_url = ollama_url
         self.is_listening = False
-        self.transcription_buffer = []
-        self.semantic_chunks = []
+        # Bounded buffers so multi-hour sessions don't grow memory without limit;
+        # monotonic counters keep IDs stable as old entries roll off
+        self.transcription_buffer = deque(maxlen=4096)
+        self._next_segment_id = 0
+        self.text_queue = queue.Queue()
+        self.semantic_chunks = deque(maxlen=1024)
+        self._next_chunk_id = 0
         self.decision_tree = nx.DiGraph()
+        self.last_node_id: Optional[str] = None
+        self._pos = {}  # cached spring layout positions
+
+        # Cache Llama analyses so repeated or near-duplicate chunks skip the LLM
+        # call; bounded to 256 entries (oldest evicted first) so it stays flat
+        # over long sessions, like the transcription buffers
+        self._analysis_cache: OrderedDict = OrderedDict()
+        self._analyzed_embeddings = deque(maxlen=256)
+        self._analyzed_results = deque(maxlen=256)
+
+        # Keep-alive connection pool so Ollama calls skip the per-request TCP handshake
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=8, pool_maxsize=8))
         
-        # Initialize sentence transformer for semantic similarity
-        self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Initialize sentence transformer for semantic similarity.
+        # Prefer the int8-quantized ONNX Runtime backend (~4x faster encode on CPU);
+        # fall back to the default PyTorch backend if ONNX support is unavailable.
+        try:
+            self.sentence_model = SentenceTransformer(
+                'all-MiniLM-L6-v2',
+                backend='onnx',
+                model_kwargs={'file_name': 'onnx/model_qint8_avx512_vnni.onnx'}
+            )
+        except Exception as e:
+            print(f"ONNX backend unavailable ({e}), falling back to PyTorch")
+            self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
         
+        # Local int8 Whisper model (CTranslate2) — transcription runs on-device
+        # with no network round-trip per utterance
+        self.stt = WhisperModel('small.en', device='cpu', compute_type='int8')
+
         # Calibrate microphone
         with self.microphone as source:
             self.recognizer.adjust_for_ambient_noise(source)
@@ -43,16 +88,17 @@ class VoiceTranscriber:
         print("Voice transcriber initialized. Microphone calibrated.")
     
     def transcribe_audio(self, audio_data) -> Optional[str]:
-        """Transcribe audio data to text."""
+        """Transcribe audio data to text using the local Whisper model."""
         try:
-            # Use Google's speech recognition (free tier)
-            text = self.recognizer.recognize_google(audio_data)
-            return text
-        except sr.UnknownValueError:
-            print("Could not understand audio")
-            return None
-        except sr.RequestError as e:
-            print(f"Could not request results from speech recognition service; {e}")
+            # Whisper expects 16 kHz mono float32 samples in [-1, 1]
+            raw = audio_data.get_raw_data(convert_rate=16000, convert_width=2)
+            audio = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+            segments, _ = self.stt.transcribe(audio, beam_size=1, vad_filter=True)
+            text = " ".join(segment.text.strip() for segment in segments).strip()
+            return text if text else None
+        except Exception as e:
+            print(f"Error transcribing audio: {e}")
             return None
     
     def start_listening(self):
@@ -61,34 +107,72 @@ class VoiceTranscriber:
         print("🎤 Started listening... Speak now!")
         
         def listen_continuously():
+            # Producer: capture and transcribe only, so the microphone never
+            # waits behind encoding or LLM calls
             with self.microphone as source:
                 while self.is_listening:
                     try:
                         # Listen for audio with timeout
                         audio = self.recognizer.listen(source, timeout=1, phrase_time_limit=5)
                         text = self.transcribe_audio(audio)
-                        
+
                         if text:
                             timestamp = datetime.now()
-                            self.transcription_buffer.append({
-                                'text': text,
-                                'timestamp': timestamp,
-                                'id': len(self.transcription_buffer)
-                            })
                             print(f"📝 [{timestamp.strftime('%H:%M:%S')}] {text}")
-                            
-                            # Process for semantic chunking
-                            self.process_semantic_chunking()
-                            
+                            self.text_queue.put({'text': text, 'timestamp': timestamp})
+
                     except sr.WaitTimeoutError:
                         continue
                     except Exception as e:
                         print(f"Error in listening: {e}")
                         continue
-        
-        # Start listening in a separate thread
+
+        def process_queue():
+            # Consumer: run the heavy encoding and decision tree work off the
+            # capture path
+            import torch
+
+            while self.is_listening or not self.text_queue.empty():
+                try:
+                    items = [self.text_queue.get(timeout=0.5)]
+                except queue.Empty:
+                    continue
+
+                # Drain whatever else queued up while we were busy so the
+                # texts go through the tokenizer and forward pass as one batch
+                while True:
+                    try:
+                        items.append(self.text_queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                try:
+                    # Encode each segment exactly once; reused for chunking below
+                    with torch.inference_mode():
+                        embeddings = self.sentence_model.encode(
+                            [item['text'] for item in items],
+                            batch_size=len(items),
+                            convert_to_numpy=True, normalize_embeddings=True,
+                            show_progress_bar=False
+                        )
+                    for item, embedding in zip(items, embeddings):
+                        # fp16 halves the per-segment footprint; unit-length 384-dim
+                        # vectors lose nothing that matters at a 0.7 threshold
+                        item['embedding'] = embedding.astype(np.float16)
+                        item['id'] = self._next_segment_id
+                        self._next_segment_id += 1
+                        self.transcription_buffer.append(item)
+
+                    # Process for semantic chunking
+                    self.process_semantic_chunking()
+                except Exception as e:
+                    print(f"Error in processing: {e}")
+
+        # Capture and processing run on separate threads
         self.listen_thread = threading.Thread(target=listen_continuously, daemon=True)
+        self.process_thread = threading.Thread(target=process_queue, daemon=True)
         self.listen_thread.start()
+        self.process_thread.start()
     
     def stop_listening(self):
         """Stop voice transcription."""
@@ -100,118 +184,138 @@ class VoiceTranscriber:
         if len(self.transcription_buffer) < 2:
             return
         
-        # Get recent transcriptions
-        recent_transcripts = self.transcription_buffer[-10:]  # Last 10 segments
-        texts = [item['text'] for item in recent_transcripts]
-        
-        if len(texts) < 2:
+        # Get recent transcriptions (deque doesn't slice)
+        recent_transcripts = list(self.transcription_buffer)[-10:]  # Last 10 segments
+
+        if len(recent_transcripts) < 2:
             return
-        
-        # Generate embeddings
-        embeddings = self.sentence_model.encode(texts)
-        
-        # Calculate similarity matrix
-        similarity_matrix = cosine_similarity(embeddings)
-        
-        # Simple clustering based on similarity threshold
+
+        # Reuse the cached per-segment embeddings; upcast the fp16 storage
+        # format to fp32 for the similarity math
+        embeddings = np.stack([item['embedding'] for item in recent_transcripts])
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+        # Embeddings are unit-length, so cosine similarity is a plain row dot product
+        sims = np.einsum('ij,ij->i', embeddings[:-1], embeddings[1:])
+
+        # Simple clustering based on similarity threshold: cut wherever adjacent
+        # similarity drops, then split the index range at those boundaries
         threshold = 0.7
-        chunks = []
-        current_chunk = [recent_transcripts[0]]
-        
-        for i in range(1, len(recent_transcripts)):
-            if similarity_matrix[i-1][i] > threshold:
-                current_chunk.append(recent_transcripts[i])
-            else:
-                if len(current_chunk) > 1:
-                    chunks.append(current_chunk)
-                current_chunk = [recent_transcripts[i]]
-        
-        if len(current_chunk) > 1:
-            chunks.append(current_chunk)
-        
+        cuts = np.flatnonzero(sims <= threshold) + 1
+        segments = np.split(np.arange(len(recent_transcripts)), cuts)
+        chunks = [[recent_transcripts[i] for i in seg] for seg in segments if len(seg) > 1]
+
         # Update semantic chunks
         for chunk in chunks:
             chunk_text = " ".join([item['text'] for item in chunk])
-            chunk_id = f"chunk_{len(self.semantic_chunks)}"
-            
+            chunk_id = f"chunk_{self._next_chunk_id}"
+            self._next_chunk_id += 1
+
+            # Mean-pool the cached segment embeddings instead of re-encoding the
+            # chunk; pool in fp32 and store back as fp16
+            chunk_embedding = np.stack(
+                [item['embedding'] for item in chunk]
+            ).astype(np.float32).mean(axis=0)
+            chunk_embedding /= np.linalg.norm(chunk_embedding)
+            chunk_embedding = chunk_embedding.astype(np.float16)
+
             self.semantic_chunks.append({
                 'id': chunk_id,
                 'text': chunk_text,
                 'segments': chunk,
                 'timestamp': chunk[0]['timestamp'],
-                'embedding': self.sentence_model.encode([chunk_text])[0]
+                'embedding': chunk_embedding
             })
             
             print(f"🧩 New semantic chunk: {chunk_text[:100]}...")
             
             # Generate decision tree nodes
-            self.generate_decision_tree_node(chunk_text, chunk_id)
+            self.generate_decision_tree_node(chunk_text, chunk_id, chunk_embedding)
     
-    def generate_decision_tree_node(self, text: str, chunk_id: str):
+    def generate_decision_tree_node(self, text: str, chunk_id: str,
+                                    embedding: Optional[np.ndarray] = None):
         """Generate decision tree nodes using Llama."""
+        # Reuse a cached analysis for exact repeats or semantic near-duplicates
+        # (cosine > 0.95) — skips a multi-second LLM round-trip on hits
+        analysis_data = self._analysis_cache.get(text)
+        if analysis_data is None and embedding is not None and self._analyzed_embeddings:
+            sims = np.stack(self._analyzed_embeddings).astype(np.float32) @ embedding.astype(np.float32)
+            best = int(np.argmax(sims))
+            if sims[best] > 0.95:
+                analysis_data = self._analyzed_results[best]
+
+        if analysis_data is not None:
+            print(f"♻️  Reusing cached analysis for: {text[:60]}...")
+            self.add_decision_tree_node(chunk_id, analysis_data, text)
+            return
+
         try:
-            # Create prompt for Llama to analyze the conversation chunk
+            # Create prompt for Llama to analyze the conversation chunk.
+            # Ollama's format=json guarantees valid JSON, so no example block is needed.
             prompt = f"""
-            Analyze this conversation segment and identify:
-            1. Main topic or decision point
-            2. Key options or choices mentioned
-            3. Context or reasoning
-            4. Next logical steps or outcomes
-            
-            Conversation segment: "{text}"
-            
-            Respond in JSON format:
-            {{
-                "topic": "main topic",
-                "decision_point": "key decision or choice",
-                "options": ["option1", "option2"],
-                "context": "background context",
-                "next_steps": ["step1", "step2"]
-            }}
+            Analyze this conversation segment: "{text}"
+
+            Respond with a JSON object with these keys:
+            "topic" (main topic), "decision_point" (key decision or choice),
+            "options" (list of choices mentioned), "context" (background context),
+            "next_steps" (list of next logical steps)
             """
             
-            # Call Ollama API
-            response = requests.post(
+            # Call Ollama API over the pooled session
+            response = self.session.post(
                 f"{self.ollama_url}/api/generate",
                 json={
                     "model": "llama3.2:3b",
                     "prompt": prompt,
-                    "stream": False
+                    "stream": True,
+                    "format": "json",
+                    "options": {"num_predict": 256}
                 },
-                timeout=30
+                timeout=30,
+                stream=True
             )
-            
+
             if response.status_code == 200:
-                result = response.json()
-                analysis = result.get('response', '')
-                
-                # Try to extract JSON from response
+                # Accumulate streamed tokens and close the connection as soon as the
+                # JSON object is balanced, so the server stops decoding extra tokens
+                analysis = ""
+                depth = 0
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    token = chunk.get('response', '')
+                    analysis += token
+                    depth += token.count('{') - token.count('}')
+                    if (depth == 0 and '{' in analysis) or chunk.get('done'):
+                        response.close()
+                        break
+
                 try:
-                    # Find JSON in the response
-                    start_idx = analysis.find('{')
-                    end_idx = analysis.rfind('}') + 1
-                    if start_idx != -1 and end_idx != -1:
-                        json_str = analysis[start_idx:end_idx]
-                        analysis_data = json.loads(json_str)
-                    else:
-                        # Fallback if no JSON found
-                        analysis_data = {
-                            "topic": "General Discussion",
-                            "decision_point": "Topic Discussion",
-                            "options": ["Continue", "Explore Further"],
-                            "context": text[:100],
-                            "next_steps": ["Continue conversation"]
-                        }
+                    analysis_data = json.loads(analysis)
+
+                    # Cache for future repeats of the same or similar content.
+                    # Fallback results are deliberately not cached, so a transient
+                    # parse failure is retried on the next occurrence instead of
+                    # sticking to this text and its near-duplicates
+                    self._analysis_cache[text] = analysis_data
+                    while len(self._analysis_cache) > 256:
+                        self._analysis_cache.popitem(last=False)
+                    # The embedding/result deques evict their oldest entry in
+                    # lockstep once full
+                    if embedding is not None:
+                        self._analyzed_embeddings.append(embedding)
+                        self._analyzed_results.append(analysis_data)
                 except json.JSONDecodeError:
                     # Fallback parsing
                     analysis_data = {
                         "topic": "General Discussion",
-                        "decision_point": "Topic Discussion", 
+                        "decision_point": "Topic Discussion",
                         "options": ["Continue", "Explore Further"],
                         "context": text[:100],
                         "next_steps": ["Continue conversation"]
                     }
-                
+
                 # Add node to decision tree
                 self.add_decision_tree_node(chunk_id, analysis_data, text)
                 
@@ -242,26 +346,37 @@ class VoiceTranscriber:
             )
             self.decision_tree.add_edge(chunk_id, option_id, label=option)
         
-        # Connect to previous nodes if they exist
-        if len(self.decision_tree.nodes()) > 1:
-            # Find the most recent node (excluding current)
-            recent_nodes = [n for n in self.decision_tree.nodes() if n != chunk_id]
-            if recent_nodes:
-                # Connect to the most recent node
-                last_node = recent_nodes[-1]
-                self.decision_tree.add_edge(last_node, chunk_id, type='follows')
-        
+        # Connect to the previous chunk node, tracked directly instead of
+        # scanning the whole graph
+        if self.last_node_id is not None:
+            self.decision_tree.add_edge(self.last_node_id, chunk_id, type='follows')
+        self.last_node_id = chunk_id
+
         print(f"🌳 Added decision tree node: {analysis.get('topic', 'Unknown')}")
     
     def visualize_decision_tree(self, save_path: str = "decision_tree.png"):
         """Visualize the decision tree."""
+        import networkx as nx
+        import matplotlib.pyplot as plt
+
         if not self.decision_tree.nodes():
             print("No decision tree nodes to visualize.")
             return
         
         plt.figure(figsize=(15, 10))
-        pos = nx.spring_layout(self.decision_tree, k=3, iterations=50)
-        
+
+        # Reuse the cached layout: keep existing nodes fixed and only settle
+        # nodes added since the last visualization
+        fixed = [n for n in self._pos if n in self.decision_tree]
+        if fixed:
+            pos = nx.spring_layout(
+                self.decision_tree, k=3, iterations=10,
+                pos=self._pos, fixed=fixed
+            )
+        else:
+            pos = nx.spring_layout(self.decision_tree, k=3, iterations=50)
+        self._pos = pos
+
         # Draw nodes
         main_nodes = [n for n in self.decision_tree.nodes() if not n.endswith('_option_')]
         option_nodes = [n for n in self.decision_tree.nodes() if n.endswith('_option_')]
@@ -312,26 +427,35 @@ class VoiceTranscriber:
             'semantic_chunks': len(self.semantic_chunks),
             'decision_nodes': len([n for n in self.decision_tree.nodes() if not n.endswith('_option_')]),
             'option_nodes': len([n for n in self.decision_tree.nodes() if n.endswith('_option_')]),
-            'transcription_buffer': self.transcription_buffer,
-            'semantic_chunks': self.semantic_chunks,
+            'transcription_buffer': list(self.transcription_buffer),
+            'semantic_chunks': list(self.semantic_chunks),
             'decision_tree_nodes': list(self.decision_tree.nodes(data=True))
         }
     
     def save_conversation_data(self, filename: str = "conversation_data.json"):
         """Save conversation data to JSON file."""
         data = self.get_conversation_summary()
-        
-        # Convert datetime objects to strings for JSON serialization
-        def convert_datetime(obj):
-            if isinstance(obj, datetime):
-                return obj.isoformat()
-            return obj
-        
-        # Convert the data
-        json_data = json.loads(json.dumps(data, default=convert_datetime))
-        
-        with open(filename, 'w') as f:
-            json.dump(json_data, f, indent=2)
+
+        # Embedding arrays aren't useful in the dump and dominate its size
+        def strip_embedding(item):
+            return {k: v for k, v in item.items() if k != 'embedding'}
+
+        data['transcription_buffer'] = [
+            strip_embedding(item) for item in data['transcription_buffer']
+        ]
+        data['semantic_chunks'] = [
+            {**strip_embedding(chunk),
+             'segments': [strip_embedding(seg) for seg in chunk['segments']]}
+            for chunk in data['semantic_chunks']
+        ]
+
+        # orjson serializes datetimes natively and writes bytes directly
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(
+                data,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY,
+                default=str
+            ))
         
         print(f"💾 Conversation data saved to {filename}")
 